@@ -0,0 +1,74 @@
+"""
+Per-call cost of the JWT user lookup: ad-hoc ORM query with and without the
+compiled SQL cache, against the reused statement in HotQueries.
+
+Run from the project root:
+    python -m benchmarks.hot_queries [calls]
+"""
+import sys
+import time
+from os import environ, remove
+from os.path import exists, join
+from tempfile import gettempdir
+
+# Must be set before src.dbModels creates its engine
+DATABASE_FILE = join(gettempdir(), "sylvan_hot_queries_bench.sqlite")
+if exists(DATABASE_FILE):
+    remove(DATABASE_FILE)
+environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DATABASE_FILE}"
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from src.dbModels import College, User, _engine, dbSession  # noqa: E402
+from src.dbModels.HotQueries import user_by_id  # noqa: E402
+from src.dbModels.SchemaModels import Base  # noqa: E402
+
+USERS = 1000
+
+
+def seed():
+    Base.metadata.create_all(_engine)
+    with dbSession() as dbsession:
+        dbsession.execute(insert(College), [{"id": "c0", "name": "College", "location": "Campus"}])
+        dbsession.execute(
+            insert(User),
+            [
+                {"id": f"u{i}", "name": f"User {i}", "email": f"user{i}@example.com",
+                 "role": "participant", "college_id": "c0"}
+                for i in range(USERS)
+            ],
+        )
+        dbsession.commit()
+
+
+def measure(label: str, lookup, calls: int, bind=None):
+    with Session(bind=bind or _engine) as dbsession:
+        lookup(dbsession, "u0")  # Warm up caches
+        start = time.perf_counter()
+        for i in range(calls):
+            lookup(dbsession, f"u{i % USERS}")
+            dbsession.expunge_all()
+        elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / calls * 1e6:>8.1f} us/call")
+
+
+def adhoc_lookup(dbsession, user_id):
+    return dbsession.query(User).filter(User.id == user_id).one_or_none()
+
+
+def main(calls: int):
+    seed()
+    uncached = _engine.execution_options(compiled_cache=None)
+    try:
+        print("JWT user lookup (user_lookup_callback)")
+        measure("ad-hoc query, no SQL cache", adhoc_lookup, calls, bind=uncached)
+        measure("ad-hoc query", adhoc_lookup, calls)
+        measure("HotQueries.user_by_id", user_by_id, calls)
+    finally:
+        _engine.dispose()
+        remove(DATABASE_FILE)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
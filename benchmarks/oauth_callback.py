@@ -0,0 +1,108 @@
+"""
+Latency of the OAuth login callback against a local stand-in provider:
+Authlib's stock client against the pooled, caching client in
+src/flasky/providers.py. Also reports the provider requests and TCP
+connections each one needed.
+
+Run from the project root:
+    python -m benchmarks.oauth_callback [callbacks]
+"""
+import statistics
+import sys
+import time
+from os import environ, remove
+from os.path import exists, join
+from tempfile import gettempdir
+from urllib.parse import parse_qs, urlparse
+
+# Must be set before src.dbModels creates its engine
+DATABASE_FILE = join(gettempdir(), "sylvan_oauth_callback_bench.sqlite")
+if exists(DATABASE_FILE):
+    remove(DATABASE_FILE)
+environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DATABASE_FILE}"
+environ.setdefault("FLASK_SESSION_KEY", "benchmark-session-key")
+environ["GOOGLE_CLIENT_ID"] = "stand-in-client"
+environ["GOOGLE_CLIENT_SECRET"] = "stand-in-secret"
+
+from authlib.integrations.flask_client import OAuth  # noqa: E402
+
+from benchmarks.oauth_provider import StandInProvider  # noqa: E402
+from src.dbModels import College, User, _engine, dbSession  # noqa: E402
+from src.dbModels.SchemaModels import Base  # noqa: E402
+from src.utils.pre_loader import config  # noqa: E402
+
+EMAIL = "stand-in@example.com"
+
+
+def seed():
+    Base.metadata.create_all(_engine)
+    with dbSession() as dbsession:
+        dbsession.add(College(id="c0", name="College", location="Campus"))
+        dbsession.add(User(id="u0", name="Stand In", email=EMAIL, role="participant", college_id="c0"))
+        dbsession.commit()
+
+
+def login_once(client) -> float:
+    response = client.get("/session/oauth/login/google?next=/done&error_page=/failed")
+    query = parse_qs(urlparse(response.headers["Location"]).query)
+
+    # The stand-in provider takes the nonce as the authorization code
+    start = time.perf_counter()
+    response = client.get(
+        f"/session/oauth/login/callback/google?code={query['nonce'][0]}&state={query['state'][0]}"
+    )
+    elapsed = time.perf_counter() - start
+    assert response.headers.get("Location", "").endswith("/done"), response.get_data(as_text=True)
+    return elapsed
+
+
+def measure(label: str, app, provider, callbacks: int):
+    client = app.test_client()
+    login_once(client)  # Warm up discovery, JWKS and connections
+    requests_before = sum(provider.requests.values())
+    connections_before = provider.connections
+
+    timings = sorted(login_once(client) for _ in range(callbacks))
+    print(
+        f"{label:<16} mean {statistics.mean(timings) * 1000:>6.2f} ms"
+        f"  p95 {timings[int(len(timings) * 0.95) - 1] * 1000:>6.2f} ms"
+        f"  provider requests {sum(provider.requests.values()) - requests_before:>5}"
+        f"  connections {provider.connections - connections_before:>5}"
+        f"  userinfo calls {provider.requests['/userinfo']}"
+    )
+
+
+def main(callbacks: int):
+    provider = StandInProvider(environ["GOOGLE_CLIENT_ID"], EMAIL).start()
+    config.set("oauth", "google_metadata_url", provider.metadata_url)
+    seed()
+
+    from src.flasky import create_app, session as session_routes
+    from src.flasky.utils import limiter, oauth
+
+    app = create_app()
+    limiter.enabled = False
+
+    stock = OAuth(app)
+    stock.register(
+        name="google",
+        client_id=environ["GOOGLE_CLIENT_ID"],
+        client_secret=environ["GOOGLE_CLIENT_SECRET"],
+        server_metadata_url=provider.metadata_url,
+        client_kwargs={"scope": "openid email profile"},
+    )
+
+    try:
+        print(f"OAuth login callback, {callbacks} calls")
+        session_routes.oauth = stock
+        measure("Authlib stock", app, provider, callbacks)
+        session_routes.oauth = oauth
+        measure("pooled + cached", app, provider, callbacks)
+    finally:
+        provider.stop()
+        _engine.dispose()
+        remove(DATABASE_FILE)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,126 @@
+"""
+Local stand-in OpenID Connect provider for exercising the OAuth callbacks
+offline. Serves a discovery document, a JWKS, a token endpoint that issues
+RS256-signed ID tokens and a userinfo endpoint, and counts requests and
+connections so connection reuse and userinfo calls can be checked.
+
+The authorization step is skipped: the caller passes the nonce from the
+authorize redirect as the authorization code, and the token endpoint echoes
+it back in the ID token.
+"""
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from joserfc import jwt
+from joserfc.jwk import RSAKey
+
+
+class StandInProvider:
+    def __init__(self, client_id: str, email: str, host: str = "127.0.0.1", port: int = 0):
+        self.client_id = client_id
+        self.email = email
+        self.key = RSAKey.generate_key(2048, parameters={"kid": "stand-in", "use": "sig", "alg": "RS256"})
+        self.requests = Counter()  # Path -> requests served
+        self.connections = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def metadata_url(self) -> str:
+        return f"{self.base_url}/.well-known/openid-configuration"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="oauth-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def metadata(self) -> dict:
+        return {
+            "issuer": self.base_url,
+            "authorization_endpoint": f"{self.base_url}/authorize",
+            "token_endpoint": f"{self.base_url}/token",
+            "userinfo_endpoint": f"{self.base_url}/userinfo",
+            "jwks_uri": f"{self.base_url}/jwks",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        }
+
+    def claims(self) -> dict:
+        return {"sub": self.email, "email": self.email, "given_name": "Stand", "family_name": "In"}
+
+    def id_token(self, nonce: str) -> str:
+        now = int(time.time())
+        claims = {
+            **self.claims(),
+            "iss": self.base_url,
+            "aud": self.client_id,
+            "iat": now,
+            "exp": now + 600,
+            "nonce": nonce,
+        }
+        return jwt.encode({"alg": "RS256", "kid": "stand-in"}, claims, self.key)
+
+    def _handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled clients can reuse connections
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this,
+                # Nagle's algorithm stalls every reused connection
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                provider.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                provider.requests[path] += 1
+                if path == "/.well-known/openid-configuration":
+                    self._send(provider.metadata())
+                elif path == "/jwks":
+                    self._send({"keys": [provider.key.as_dict(private=False)]})
+                elif path == "/userinfo":
+                    self._send(provider.claims())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                provider.requests[path] += 1
+                form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+                if path != "/token":
+                    self.send_error(404)
+                    return
+                self._send({
+                    "access_token": "stand-in-access-token",
+                    "token_type": "Bearer",
+                    "expires_in": 3600,
+                    "id_token": provider.id_token(form["code"][0]),
+                })
+
+        return Handler
@@ -0,0 +1,73 @@
+"""
+Compare ORM loading with read models for a large users table.
+
+Run from the project root:
+    python -m benchmarks.read_models [rows]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from os import environ, remove
+from os.path import exists, join
+from tempfile import gettempdir
+
+# Must be set before src.dbModels creates its engine
+DATABASE_FILE = join(gettempdir(), "sylvan_read_models_bench.sqlite")
+if exists(DATABASE_FILE):
+    remove(DATABASE_FILE)
+environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DATABASE_FILE}"
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from src.dbModels import College, User, _engine, dbSession  # noqa: E402
+from src.dbModels.ReadModels import select_rows  # noqa: E402
+from src.dbModels.SchemaModels import Base  # noqa: E402
+
+
+def seed(rows: int):
+    Base.metadata.create_all(_engine)
+    with dbSession() as dbsession:
+        dbsession.execute(insert(College), [{"id": "c0", "name": "College", "location": "Campus"}])
+        dbsession.execute(
+            insert(User),
+            [
+                {"id": f"u{i}", "name": f"User {i}", "email": f"user{i}@example.com",
+                 "role": "participant", "college_id": "c0"}
+                for i in range(rows)
+            ],
+        )
+        dbsession.commit()
+
+
+def measure(label: str, load, rows: int):
+    # Time and memory are measured in separate runs; tracemalloc slows loading down
+    gc.collect()
+    with dbSession() as dbsession:
+        start = time.perf_counter()
+        result = load(dbsession)
+        elapsed = time.perf_counter() - start
+    assert len(result) == rows
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    with dbSession() as dbsession:
+        result = load(dbsession)
+        retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {rows / elapsed:>12,.0f} rows/s {retained / rows:>10,.0f} bytes/row")
+
+
+def main(rows: int):
+    seed(rows)
+    try:
+        measure("ORM", lambda dbsession: dbsession.scalars(select(User)).all(), rows)
+        measure("read models", lambda dbsession: select_rows(dbsession, User), rows)
+    finally:
+        _engine.dispose()
+        remove(DATABASE_FILE)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
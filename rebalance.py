@@ -0,0 +1,54 @@
+from argparse import ArgumentParser
+
+from dotenv import load_dotenv
+
+from src.utils.pre_loader import config
+
+# Load env variables
+load_dotenv(config.get("application", "env_file"))
+
+from src.dbModels import shardRouter
+
+
+def move(college_id: str, target: str, source: str = None):
+    print(f"{college_id}: {source or shardRouter.shard_for(college_id)} -> {target}")
+    for table, count in shardRouter.move_college(college_id, target, source).items():
+        print(f"  {table}: {count} rows")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Move a college's data to another shard, fix up colleges "
+                    "left on the wrong shard after [sharding] shards changed, or copy "
+                    "the reference tables from the default shard to the others."
+    )
+    parser.add_argument("college_id", nargs="?")
+    parser.add_argument("shard", nargs="?", choices=shardRouter.names)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--pin-misplaced", action="store_true",
+                       help="pin misplaced colleges to the shard that holds them")
+    group.add_argument("--move-misplaced", action="store_true",
+                       help="move misplaced colleges to the shard they are routed to")
+    group.add_argument("--sync-reference", action="store_true",
+                       help="copy matches, teams, venues, ... from the default shard to the others")
+    args = parser.parse_args()
+
+    if args.sync_reference:
+        for table, count in shardRouter.sync_reference().items():
+            print(f"{table}: {count} rows")
+    elif args.college_id:
+        if not args.shard:
+            parser.error("a target shard is required")
+        move(args.college_id, args.shard)
+    else:
+        misplaced = shardRouter.misplaced()
+        if not misplaced:
+            print("Every college is on the shard it is routed to")
+        for college_id, stored, routed in misplaced:
+            if args.pin_misplaced:
+                shardRouter.pin(college_id, stored)
+                print(f"{college_id}: pinned to {stored}")
+            elif args.move_misplaced:
+                move(college_id, routed, source=stored)
+            else:
+                print(f"{college_id}: stored on {stored}, routed to {routed}")
@@ -0,0 +1,315 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.dbModels.AnalyticsModels import ActivityFact, ParticipationRollup, RollupWatermark
+from src.dbModels.SchemaModels import Event, Match, User
+from src.utils.generators import generate_id
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "participation"
+
+# Coarsest first
+GRANULARITIES = ("month", "week", "day")
+
+# Most buckets one participation_series call may return
+MAX_BUCKETS = 1000
+
+# Most ids per IN (...) list, below SQLite's bound parameter limit
+LOOKUP_CHUNK = 500
+
+# Dimension name -> key holding its id once a fact is resolved by roll_up
+DIMENSIONS = {
+    "all": None,
+    "game_category": "game_category_id",
+    "college": "college_id",
+    "event": "event_id",
+}
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the `granularity` bucket containing `moment`."""
+    day = datetime(moment.year, moment.month, moment.day)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # Weeks start on Monday
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(weeks=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def bucket_count(start: datetime, end: datetime, granularity: str) -> int:
+    """Number of `granularity` buckets in [start, end), both bucket boundaries."""
+    if granularity == "day":
+        return (end - start).days
+    if granularity == "week":
+        return (end - start).days // 7
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def user_colleges(dbsession, user_ids) -> dict:
+    """Map each of `user_ids` found in `dbsession`'s database to its college."""
+    user_ids = list(set(user_ids))
+    colleges = {}
+    for index in range(0, len(user_ids), LOOKUP_CHUNK):
+        colleges.update(dbsession.execute(
+            select(User.id, User.college_id).where(User.id.in_(user_ids[index:index + LOOKUP_CHUNK]))
+        ).all())
+    return colleges
+
+
+def roll_up(dbsession, settle_seconds: int = 60, batch_size: int = 50000, colleges_for=None) -> int:
+    """
+    Fold settled activity facts into the rollup tables. Facts recorded less
+    than `settle_seconds` ago, by the database clock that stamps them, are
+    left for the next run so that inserts still in flight are not skipped.
+    Returns the number of facts processed.
+
+    Each run claims up to `batch_size` facts by tagging them with a batch id,
+    only where no other run has, and commits the tags with the rollups; when
+    several processes roll up at once only one of them counts a given fact.
+
+    Facts only carry the user and match. The game category and event come
+    from one query joining the batch to its matches, and the colleges from
+    `colleges_for(user_ids)`, by default the users in `dbsession`'s database.
+    """
+    if dbsession.get(RollupWatermark, WATERMARK) is None:
+        try:
+            dbsession.add(RollupWatermark(name=WATERMARK))
+            dbsession.commit()
+        except IntegrityError:
+            dbsession.rollback()  # Created by another process meanwhile
+
+    cutoff = dbsession.scalar(select(func.now())) - timedelta(seconds=settle_seconds)
+    batch = generate_id()
+    settled = (
+        select(ActivityFact.id)
+        .where(ActivityFact.rollup_batch.is_(None), ActivityFact.recorded_at <= cutoff)
+        .order_by(ActivityFact.recorded_at)
+        .limit(batch_size)
+    )
+    claimed = dbsession.execute(
+        update(ActivityFact)
+        # Checked again outside the subquery so a fact claimed by a
+        # concurrent run is skipped once its lock is released
+        .where(ActivityFact.id.in_(settled), ActivityFact.rollup_batch.is_(None))
+        .values(rollup_batch=batch)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        dbsession.rollback()
+        return 0
+
+    # Events are not linked to matches; a match counts towards the earliest
+    # event whose dates cover its scheduled time
+    event_id = (
+        select(Event.id)
+        .where(Event.start_date <= Match.scheduled_time, Event.end_date >= Match.scheduled_time)
+        .order_by(Event.start_date)
+        .limit(1)
+        .scalar_subquery()
+    )
+    facts = dbsession.execute(
+        select(
+            ActivityFact.kind,
+            ActivityFact.occurred_at,
+            ActivityFact.user_id,
+            Match.game_category_id,
+            event_id.label("event_id"),
+        )
+        .outerjoin(Match, Match.id == ActivityFact.match_id)
+        .where(ActivityFact.rollup_batch == batch)
+    ).all()
+    user_ids = {fact.user_id for fact in facts if fact.user_id is not None}
+    colleges = (colleges_for or (lambda ids: user_colleges(dbsession, ids)))(user_ids)
+
+    counts = defaultdict(lambda: [0, 0])  # key -> [participations, matches]
+    for fact in facts:
+        column = 0 if fact.kind == "participation" else 1
+        resolved = {
+            "game_category_id": fact.game_category_id,
+            "college_id": colleges.get(fact.user_id),
+            "event_id": fact.event_id,
+        }
+        for granularity in GRANULARITIES:
+            start = bucket_start(fact.occurred_at, granularity)
+            for dimension, key in DIMENSIONS.items():
+                dimension_id = "" if key is None else resolved[key]
+                if dimension_id is not None:
+                    counts[(granularity, start, dimension, dimension_id)][column] += 1
+
+    if counts:
+        # One query for every rollup row the batch could touch
+        earliest = min(start for _, start, _, _ in counts)
+        existing = {
+            (row.granularity, row.bucket_start, row.dimension, row.dimension_id): row
+            for row in dbsession.execute(
+                select(ParticipationRollup).where(ParticipationRollup.bucket_start >= earliest)
+            ).scalars()
+        }
+        for key, (participations, matches) in counts.items():
+            row = existing.get(key)
+            if row is None:
+                granularity, start, dimension, dimension_id = key
+                row = ParticipationRollup(
+                    granularity=granularity, bucket_start=start, dimension=dimension,
+                    dimension_id=dimension_id, participations=0, matches=0,
+                )
+                dbsession.add(row)
+            row.participations += participations
+            row.matches += matches
+
+    dbsession.execute(
+        update(RollupWatermark)
+        .where(RollupWatermark.name == WATERMARK)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    dbsession.commit()
+    return len(facts)
+
+
+def coarsest_granularity(start: datetime, end: datetime) -> str:
+    """Coarsest granularity whose buckets line up with both ends of [start, end)."""
+    for granularity in GRANULARITIES:
+        if bucket_start(start, granularity) == start and bucket_start(end, granularity) == end:
+            return granularity
+    raise ValueError("start and end must be whole days")
+
+
+def participation_series(dbsession, start: datetime, end: datetime, dimension: str = "all",
+                         dimension_id: str = "", granularity: str = None) -> dict:
+    """
+    Participation and match counts per bucket for [start, end), read from the
+    coarsest rollup that fits the range unless `granularity` is given.
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+    if end <= start:
+        raise ValueError("end must be after start")
+    if granularity is None:
+        granularity = coarsest_granularity(start, end)
+    elif bucket_start(start, granularity) != start or bucket_start(end, granularity) != end:
+        raise ValueError(f"start and end must be {granularity} boundaries")
+    if bucket_count(start, end, granularity) > MAX_BUCKETS:
+        raise ValueError(f"At most {MAX_BUCKETS} {granularity} buckets per request")
+
+    rows = {
+        row.bucket_start: row
+        for row in dbsession.execute(
+            select(ParticipationRollup).where(
+                ParticipationRollup.granularity == granularity,
+                ParticipationRollup.dimension == dimension,
+                ParticipationRollup.dimension_id == ("" if dimension == "all" else dimension_id),
+                ParticipationRollup.bucket_start >= start,
+                ParticipationRollup.bucket_start < end,
+            )
+        ).scalars()
+    }
+
+    series = []
+    bucket = start
+    while bucket < end:
+        row = rows.get(bucket)
+        series.append({
+            "bucket_start": bucket.date().isoformat(),
+            "participations": row.participations if row else 0,
+            "matches": row.matches if row else 0,
+        })
+        bucket = next_bucket(bucket, granularity)
+
+    watermark = dbsession.get(RollupWatermark, WATERMARK)
+    return {
+        "granularity": granularity,
+        "dimension": dimension,
+        "dimension_id": dimension_id if dimension != "all" else None,
+        "as_of": watermark.updated_at.isoformat() if watermark and watermark.updated_at else None,
+        "totals": {
+            "participations": sum(point["participations"] for point in series),
+            "matches": sum(point["matches"] for point in series),
+        },
+        "series": series,
+    }
+
+
+class ActivityRecorder:
+    """
+    Records activity facts through a write-behind buffer. Only the user and
+    match are stored; `roll_up` looks up the college, game category and event
+    for a whole batch of facts at once.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def record_participation(self, user_id: str, match_id: str) -> dict:
+        """Record `user_id` taking part in `match_id`; returns the queued fact."""
+        return self.buffer.submit(ActivityFact, kind="participation", user_id=user_id, match_id=match_id)
+
+    def record_match(self, match_id: str) -> dict:
+        """Record `match_id` being played; returns the queued fact."""
+        return self.buffer.submit(ActivityFact, kind="match", match_id=match_id)
+
+
+class RollupScheduler:
+    """
+    Runs `roll_up` every `interval` seconds on a background thread, passing
+    `colleges_for` through to it.
+    """
+
+    def __init__(self, session_factory, interval: float = 300, settle_seconds: int = 60,
+                 colleges_for=None):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.colleges_for = colleges_for
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background rollup thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="participation-rollup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run_once(self) -> int:
+        """Roll up until no settled facts are left; returns the number processed."""
+        total = 0
+        while True:
+            with self.session_factory() as dbsession:
+                processed = roll_up(
+                    dbsession, settle_seconds=self.settle_seconds, colleges_for=self.colleges_for
+                )
+            total += processed
+            if not processed:
+                return total
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                processed = self.run_once()
+                if processed:
+                    logger.info(f"Rolled up {processed} activity facts")
+            except Exception as e:
+                logger.error(f"Participation rollup failed: {str(e)}")
@@ -0,0 +1,61 @@
+from sqlalchemy import DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+
+from src.dbModels.BaseModel import Base
+
+
+class ActivityFact(Base):
+    """
+    Append-only record of one participation or one match being played. The
+    id is generated when the fact is queued, so a fact replayed from a
+    write-behind journal collides with the copy already written.
+    """
+
+    __tablename__ = "activity_facts"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False)  # "participation" or "match"
+    occurred_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False, index=True)
+    recorded_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False)
+    user_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    match_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Set by the rollup run that claimed the fact
+    rollup_batch: Mapped[Optional[str]] = mapped_column(
+        String, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"ActivityFact(id={self.id!r}, kind={self.kind!r}, occurred_at={self.occurred_at!r})"
+
+
+class ParticipationRollup(Base):
+    """Pre-aggregated counts for one time bucket of one dimension value."""
+
+    __tablename__ = "participation_rollups"
+
+    granularity: Mapped[str] = mapped_column(String, primary_key=True)  # "day", "week" or "month"
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    dimension: Mapped[str] = mapped_column(String, primary_key=True)  # "all", "game_category", ...
+    dimension_id: Mapped[str] = mapped_column(String, primary_key=True)  # "" for "all"
+    participations: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False)
+    matches: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"ParticipationRollup(granularity={self.granularity!r}, bucket_start={self.bucket_start!r}, "
+            f"dimension={self.dimension!r}, dimension_id={self.dimension_id!r})"
+        )
+
+
+class RollupWatermark(Base):
+    """When the named job last folded activity facts into the rollups."""
+
+    __tablename__ = "rollup_watermarks"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True)
@@ -0,0 +1,72 @@
+"""
+Statements on the authentication hot path, each built once and reused.
+
+A reused statement object keeps its memoized cache key, so later executions
+skip building the statement and computing its key and go straight to the
+engine's compiled SQL cache with new bound values. On drivers that support it
+(psycopg 3), the engine also turns repeated statements into server-side
+prepared statements; see `prepare_threshold` in config.ini.
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import joinedload
+
+from src.dbModels.SchemaModels import User
+
+
+class HotQuery:
+    """A statement built on first use and then shared by every call."""
+
+    def __init__(self, name: str, build):
+        self.name = name
+        self._build = build
+        self._statement = None
+
+    @property
+    def statement(self):
+        if self._statement is None:
+            self._statement = self._build()
+        return self._statement
+
+    def execute(self, dbsession, **params):
+        return dbsession.execute(self.statement, params)
+
+
+USER_BY_ID = HotQuery(
+    "user_by_id",
+    lambda: select(User).where(User.id == bindparam("user_id")),
+)
+COMPLETE_USER_BY_ID = HotQuery(
+    "complete_user_by_id",
+    lambda: select(User)
+    .options(joinedload(User.preferences))
+    .where(User.id == bindparam("user_id")),
+)
+COMPLETE_USER_BY_CREDENTIALS = HotQuery(
+    "complete_user_by_credentials",
+    lambda: select(User)
+    .options(joinedload(User.preferences))
+    .where(User.email == bindparam("email"), User.password == bindparam("password_hash")),
+)
+
+
+def user_by_id(dbsession, user_id):
+    """The user with `user_id`, or None. Used by the JWT user loader."""
+    return USER_BY_ID.execute(dbsession, user_id=user_id).scalar_one_or_none()
+
+
+def complete_user_by_id(dbsession, user_id):
+    """The user with `user_id` and their preferences, or None."""
+    return COMPLETE_USER_BY_ID.execute(dbsession, user_id=user_id).unique().scalar_one_or_none()
+
+
+def complete_user_by_credentials(dbsession, email: str, password_hash: str):
+    """
+    The user matching `email` and `password_hash` with their preferences, or
+    None. Lets login check credentials and load the user in one round-trip.
+    """
+    return (
+        COMPLETE_USER_BY_CREDENTIALS.execute(dbsession, email=email, password_hash=password_hash)
+        .unique()
+        .scalars()
+        .first()
+    )
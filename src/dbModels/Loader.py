@@ -0,0 +1,213 @@
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from src.dbModels.ReadModels import select_rows
+from src.dbModels.SchemaModels import (
+    Achievement, College, Event, GameCategory, Match, Participant,
+    Schedule, Sponsorship, Team, User, Venue
+)
+
+# Entity type name -> model, looked up by primary key
+ENTITIES = {
+    "user": User,
+    "college": College,
+    "event": Event,
+    "achievement": Achievement,
+    "match": Match,
+    "game_category": GameCategory,
+    "team": Team,
+    "venue": Venue,
+}
+
+# (entity type, relation) -> (child model, foreign key on the child)
+TO_MANY = {
+    ("user", "achievements"): (Achievement, Achievement.user_id),
+    ("user", "participants"): (Participant, Participant.user_id),
+    ("college", "users"): (User, User.college_id),
+    ("event", "sponsorships"): (Sponsorship, Sponsorship.event_id),
+    ("match", "participants"): (Participant, Participant.match_id),
+    ("match", "schedules"): (Schedule, Schedule.match_id),
+    ("team", "participants"): (Participant, Participant.team_id),
+    ("venue", "schedules"): (Schedule, Schedule.venue_id),
+}
+
+# Model -> columns returned to clients. Anything not listed here (emails,
+# participation tokens, organiser ids, sponsorship amounts) never leaves the
+# loader. Foreign keys used to resolve relations must stay listed.
+FIELDS = {
+    User: ("id", "name", "role", "college_id"),
+    College: ("id", "name", "location"),
+    Event: ("id", "name", "start_date", "end_date", "status"),
+    Sponsorship: ("id", "event_id", "sponsor_name"),
+    Achievement: ("id", "user_id", "description", "date_achieved"),
+    Match: ("id", "game_category_id", "scheduled_time", "status", "winner_id"),
+    GameCategory: ("id", "name", "type"),
+    Participant: ("user_id", "match_id", "team_id"),
+    Team: ("id", "name", "skill_level"),
+    Schedule: ("id", "match_id", "venue_id", "start_time", "end_time"),
+    Venue: ("id", "name", "location", "capacity"),
+}
+
+
+def _college_users(college_id: str):
+    return select(User.id).where(User.college_id == college_id).scalar_subquery()
+
+
+# Model -> criteria limiting user-scoped rows to the caller's college. Rows
+# outside it load as missing, whether asked for directly or via a relation.
+USER_SCOPED = {
+    User: lambda college_id: User.college_id == college_id,
+    Achievement: lambda college_id: Achievement.user_id.in_(_college_users(college_id)),
+    Participant: lambda college_id: Participant.user_id.in_(_college_users(college_id)),
+}
+
+# (entity type, relation) -> (parent entity type, foreign key column name)
+TO_ONE = {
+    ("user", "college"): ("college", "college_id"),
+    ("achievement", "user"): ("user", "user_id"),
+    ("match", "game_category"): ("game_category", "game_category_id"),
+    ("match", "winner"): ("team", "winner_id"),
+}
+
+
+def _rows(dbsession, model, *criteria) -> list:
+    fields = FIELDS[model]
+    return [
+        {field: value for field, value in row.as_dict().items() if field in fields}
+        for row in select_rows(dbsession, model, *criteria)
+    ]
+
+
+class BatchLoader:
+    """
+    Collects entity and relationship lookups for one request and resolves
+    them with a single `IN (...)` query per entity type or relation,
+    deduplicating repeated ids.
+
+    Queue lookups with `load`, call `dispatch`, then read them back with
+    `resolve`. Only the `FIELDS` of each row are returned, and user-scoped
+    rows are limited to those in `college_id`, the caller's college.
+
+    `dbsession` is on the caller's shard, which holds everything the caller
+    can see except other colleges; with a `router`, college rows are read
+    from the shard each college lives on.
+    """
+
+    def __init__(self, dbsession, college_id: str, router=None):
+        self.dbsession = dbsession
+        self.college_id = college_id
+        self.router = router
+        self._entities = defaultdict(dict)  # type -> {id: row or None}
+        self._children = defaultdict(dict)  # (type, relation) -> {id: [rows]}
+        self._pending = defaultdict(set)  # type -> ids
+        self._pending_children = defaultdict(set)  # (type, relation) -> ids
+        self._pending_parents = []  # (type, id, relation)
+        self.requested = 0
+        self.queries = 0
+
+    def load(self, entity: str, entity_id, include: list = ()):
+        """Queue `entity` `entity_id` and the named relations to include with it."""
+        if entity not in ENTITIES:
+            raise ValueError(f"Unknown entity type: {entity}")
+        for relation in include:
+            if (entity, relation) not in TO_MANY and (entity, relation) not in TO_ONE:
+                raise ValueError(f"Unknown relation for {entity}: {relation}")
+
+        self.requested += 1 + len(include)
+        self._queue(entity, entity_id)
+        for relation in include:
+            if (entity, relation) in TO_MANY:
+                if entity_id not in self._children[(entity, relation)]:
+                    self._pending_children[(entity, relation)].add(entity_id)
+            else:
+                self._pending_parents.append((entity, entity_id, relation))
+
+    def dispatch(self):
+        """Run the queued lookups, repeating until to-one relations are resolved too."""
+        while self._pending or self._pending_children or self._pending_parents:
+            pending, self._pending = self._pending, defaultdict(set)
+            for entity, ids in pending.items():
+                model = ENTITIES[entity]
+                primary_key = model.__table__.primary_key.columns[0]
+                found = {row[primary_key.name]: row for row in self._entity_rows(model, ids)}
+                for entity_id in ids:
+                    self._entities[entity][entity_id] = found.get(entity_id)
+
+            pending_children, self._pending_children = self._pending_children, defaultdict(set)
+            for (entity, relation), ids in pending_children.items():
+                model, foreign_key = TO_MANY[(entity, relation)]
+                grouped = defaultdict(list)
+                for row in _rows(self.dbsession, model, foreign_key.in_(ids), *self._scope(model)):
+                    grouped[row[foreign_key.name]].append(row)
+                self.queries += 1
+                for entity_id in ids:
+                    self._children[(entity, relation)][entity_id] = grouped.get(entity_id, [])
+
+            # To-one relations need the owning row first, so they queue the
+            # parent lookups for the next pass
+            waiting = []
+            for entity, entity_id, relation in self._pending_parents:
+                if entity_id not in self._entities[entity]:
+                    waiting.append((entity, entity_id, relation))
+                    continue
+                row = self._entities[entity][entity_id]
+                parent, column = TO_ONE[(entity, relation)]
+                if row is not None and row[column] is not None:
+                    self._queue(parent, row[column])
+            self._pending_parents = waiting
+
+    def resolve(self, entity: str, entity_id, include: list = ()):
+        """Return the loaded row with its included relations, or None if it does not exist."""
+        row = self._entities[entity].get(entity_id)
+        if row is None:
+            return None
+        result = dict(row)
+        for relation in include:
+            if (entity, relation) in TO_MANY:
+                result[relation] = self._children[(entity, relation)].get(entity_id, [])
+            else:
+                parent, column = TO_ONE[(entity, relation)]
+                result[relation] = self._entities[parent].get(row[column])
+        return result
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "requested": self.requested,
+            "unique": sum(len(rows) for rows in self._entities.values())
+            + sum(len(rows) for rows in self._children.values()),
+            "queries": self.queries,
+            "round_trips_saved": max(self.requested - self.queries, 0),
+        }
+
+    def _entity_rows(self, model, ids) -> list:
+        # Colleges are the only entities that span shards; each shard
+        # holding some of `ids` costs one query
+        primary_key = model.__table__.primary_key.columns[0]
+        if model is not College or self.router is None:
+            self.queries += 1
+            return _rows(self.dbsession, model, primary_key.in_(ids), *self._scope(model))
+
+        by_shard = defaultdict(set)
+        for college_id in ids:
+            by_shard[self.router.shard_for(college_id)].add(college_id)
+        caller_shard = self.router.shard_for(self.college_id)
+        rows = []
+        for shard, shard_ids in by_shard.items():
+            self.queries += 1
+            if shard == caller_shard:
+                rows += _rows(self.dbsession, model, primary_key.in_(shard_ids))
+                continue
+            with self.router.session_factory(shard)() as dbsession:
+                rows += _rows(dbsession, model, primary_key.in_(shard_ids))
+        return rows
+
+    def _scope(self, model) -> tuple:
+        if model in USER_SCOPED:
+            return (USER_SCOPED[model](self.college_id),)
+        return ()
+
+    def _queue(self, entity: str, entity_id):
+        if entity_id not in self._entities[entity]:
+            self._pending[entity].add(entity_id)
@@ -0,0 +1,35 @@
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from src.dbModels.SchemaModels import Base
+
+
+def _read_model(model):
+    columns = [column.name for column in model.__table__.columns]
+    row_tuple = namedtuple(f"{model.__name__}Row", columns)
+
+    # Subclass only to add `as_dict`; the empty __slots__ keeps it a plain tuple
+    return type(
+        row_tuple.__name__,
+        (row_tuple,),
+        {"__slots__": (), "as_dict": lambda self: dict(zip(self._fields, self))},
+    )
+
+
+# One immutable row type per SchemaModels table, e.g. READ_MODELS[User] -> UserRow
+READ_MODELS = {mapper.class_: _read_model(mapper.class_) for mapper in Base.registry.mappers}
+
+
+def select_rows(dbsession, model, *criteria, order_by=None, limit=None) -> list:
+    """
+    Load `model` rows matching `criteria` as lightweight read models.
+    Only the mapped columns are selected and nothing is added to the session
+    identity map, so this suits read-only list and leaderboard views.
+    """
+    statement = select(*model.__table__.columns).where(*criteria)
+    if order_by is not None:
+        statement = statement.order_by(order_by)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return list(map(READ_MODELS[model]._make, dbsession.execute(statement).tuples()))
@@ -0,0 +1,290 @@
+import heapq
+import json
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from os import replace, stat
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from src.dbModels.Analytics import user_colleges
+from src.dbModels.SchemaModels import (
+    Achievement, Certificate, College, Event, GameCategory, Match, Participant,
+    Schedule, Sponsorship, Team, User, Venue
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD = "default"
+
+# Tables that are not college-scoped, parents before children. They are
+# written on the default shard and copied to the others by `sync_reference`.
+REFERENCE_MODELS = [GameCategory, Team, Match, Venue, Schedule, Event, Sponsorship]
+
+# Buffered tables that belong on their user's shard
+USER_SCOPED_TABLES = {Achievement.__tablename__, Participant.__tablename__}
+
+
+class ShardRouter:
+    """
+    Routes college-scoped data (colleges, users, achievements, participants,
+    certificates) to one of several databases.
+
+    A college lives on the shard pinned for it in the directory file, or on
+    the shard picked by rendezvous hashing of its id, so adding a shard only
+    re-routes the colleges that hash to the new one. The directory is
+    reloaded whenever the file changes, so pins written by `rebalance.py`
+    reach running workers. Reference tables (matches, teams, venues, ...)
+    live on the default shard and are copied to the others by
+    `sync_reference`, so they can be joined against on any shard.
+    """
+
+    def __init__(self, engines: dict, directory_file: str = None):
+        if DEFAULT_SHARD not in engines:
+            raise ValueError(f"The {DEFAULT_SHARD} shard is required")
+        self.names = list(engines)
+        self.engines = engines
+        self.directory_file = directory_file
+        self._sessions = {name: sessionmaker(bind=engine) for name, engine in engines.items()}
+        self._directory_lock = threading.Lock()
+        self._directory, self._directory_mtime = self._load_directory()
+
+    def shard_for(self, college_id: str) -> str:
+        """Return the name of the shard that holds `college_id`."""
+        pinned = self._current_directory().get(college_id)
+        if pinned in self.engines:
+            return pinned
+        return self.hashed_shard(college_id)
+
+    def hashed_shard(self, college_id: str) -> str:
+        """The shard `college_id` is routed to when it is not pinned."""
+        return max(
+            self.names,
+            key=lambda name: blake2b(f"{name}:{college_id}".encode(), digest_size=8).digest(),
+        )
+
+    def session(self, college_id: str):
+        """Open a session on the shard that holds `college_id`."""
+        return self._sessions[self.shard_for(college_id)]()
+
+    def session_factory(self, shard: str):
+        """The sessionmaker bound to `shard`."""
+        return self._sessions[shard]
+
+    def scatter(self, query_fn, shards: list = None) -> dict:
+        """
+        Run `query_fn(dbsession)` on every shard in parallel and return the
+        results keyed by shard name.
+        """
+        shards = shards or self.names
+
+        def run(name):
+            with self._sessions[name]() as dbsession:
+                return query_fn(dbsession)
+
+        if len(shards) == 1:
+            return {shards[0]: run(shards[0])}
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            return dict(zip(shards, executor.map(run, shards)))
+
+    def for_user(self, query_fn, college_id: str = None):
+        """
+        Run `query_fn(dbsession)` on the shard of `college_id`. When the
+        college is not known, e.g. a login by email, every shard is asked and
+        the first result that is not None is returned.
+        """
+        if college_id is not None:
+            with self.session(college_id) as dbsession:
+                return query_fn(dbsession)
+        results = self.scatter(query_fn)
+        return next((results[name] for name in self.names if results[name] is not None), None)
+
+    def locate_users(self, user_ids) -> dict:
+        """Map each of `user_ids` that exists to the shard storing it."""
+        user_ids = list(set(user_ids))
+        if len(self.names) == 1:
+            return dict.fromkeys(user_ids, self.names[0])
+        stored = self.scatter(
+            lambda dbsession: dbsession.scalars(select(User.id).where(User.id.in_(user_ids))).all()
+        )
+        return {user_id: shard for shard, found in stored.items() for user_id in found}
+
+    def user_colleges(self, user_ids) -> dict:
+        """Map each of `user_ids` that exists on any shard to its college."""
+        user_ids = list(set(user_ids))
+        colleges = {}
+        for found in self.scatter(lambda dbsession: user_colleges(dbsession, user_ids)).values():
+            colleges.update(found)
+        return colleges
+
+    def route_records(self, records: list) -> dict:
+        """
+        Group write-behind records by the sessionmaker they must be written
+        with: achievements and participants go to their user's shard,
+        everything else (activity facts) to the default shard.
+        """
+        if len(self.names) == 1:
+            return {self._sessions[self.names[0]]: records}
+        shards = self.locate_users(
+            record["values"]["user_id"] for record in records if record["table"] in USER_SCOPED_TABLES
+        )
+        routed = defaultdict(list)
+        for record in records:
+            shard = DEFAULT_SHARD
+            if record["table"] in USER_SCOPED_TABLES:
+                shard = shards.get(record["values"]["user_id"], DEFAULT_SHARD)
+            routed[self._sessions[shard]].append(record)
+        return routed
+
+    def global_leaderboard(self, limit: int = 10) -> list:
+        """
+        Users with the most achievements across all colleges. Each shard
+        returns its own top `limit`, which are then merged.
+        """
+        def shard_top(dbsession):
+            rows = dbsession.execute(
+                select(User.id, User.name, User.college_id, func.count(Achievement.id).label("score"))
+                .join(Achievement, Achievement.user_id == User.id)
+                .group_by(User.id, User.name, User.college_id)
+                .order_by(func.count(Achievement.id).desc())
+                .limit(limit)
+            )
+            return [row._asdict() for row in rows]
+
+        results = self.scatter(shard_top)
+        return heapq.nlargest(
+            limit, (row for rows in results.values() for row in rows), key=lambda row: row["score"]
+        )
+
+    def misplaced(self) -> list:
+        """
+        Colleges with a college row or users stored on a shard other than the
+        one they are routed to, e.g. after a shard was added, as
+        (college_id, stored on, routed to).
+        """
+        def stored_colleges(dbsession):
+            return set(dbsession.scalars(select(College.id))) | set(
+                dbsession.scalars(select(User.college_id).distinct())
+            )
+
+        stored = self.scatter(stored_colleges)
+        misplaced = []
+        for shard, college_ids in stored.items():
+            for college_id in sorted(college_ids):
+                routed = self.shard_for(college_id)
+                if routed != shard:
+                    misplaced.append((college_id, shard, routed))
+        return misplaced
+
+    def sync_reference(self) -> dict:
+        """
+        Copy the reference tables from the default shard to every other
+        shard, inserting new rows and updating changed ones. Rows deleted on
+        the default shard are left in place, since participants may still
+        point at them. Returns the number of rows copied per table.
+        """
+        copied = defaultdict(int)
+        with self._sessions[DEFAULT_SHARD]() as source:
+            tables = [
+                (model, [row._asdict() for row in source.execute(select(model.__table__))])
+                for model in REFERENCE_MODELS
+            ]
+
+        for name in self.names:
+            if name == DEFAULT_SHARD:
+                continue
+            with self._sessions[name]() as dbsession:
+                for model, rows in tables:
+                    existing = set(dbsession.scalars(select(model.id)))
+                    new_rows = [row for row in rows if row["id"] not in existing]
+                    old_rows = [row for row in rows if row["id"] in existing]
+                    if new_rows:
+                        dbsession.execute(insert(model), new_rows)
+                    if old_rows:
+                        dbsession.execute(update(model), old_rows)
+                    copied[model.__tablename__] += len(rows)
+                dbsession.commit()
+
+        logger.info(f"Synced reference tables to {len(self.names) - 1} shard(s): {dict(copied)}")
+        return dict(copied)
+
+    def move_college(self, college_id: str, target: str, source: str = None) -> dict:
+        """
+        Copy a college and its users' rows from `source` (by default the
+        shard it is routed to) to `target`, pin the college there and delete
+        the rows from the old shard. Writes for the college should be paused
+        while this runs. Returns the number of rows moved per table.
+        """
+        if target not in self.engines:
+            raise ValueError(f"Unknown shard: {target}")
+        source = source or self.shard_for(college_id)
+        if source == target:
+            return {}
+
+        user_ids = select(User.id).where(User.college_id == college_id).scalar_subquery()
+        # Parents before children so foreign keys hold on insert
+        scoped = [
+            (College.__table__, College.id == college_id),
+            (User.__table__, User.college_id == college_id),
+            (Achievement.__table__, Achievement.user_id.in_(user_ids)),
+            (Participant.__table__, Participant.user_id.in_(user_ids)),
+            (Certificate.__table__, Certificate.participant_id.in_(user_ids)),
+        ]
+
+        moved = {}
+        with self.engines[source].connect() as src, self.engines[target].begin() as dst:
+            for table, criteria in scoped:
+                rows = [row._asdict() for row in src.execute(select(table).where(criteria))]
+                if rows:
+                    dst.execute(insert(table), rows)
+                moved[table.name] = len(rows)
+
+        self.pin(college_id, target)
+
+        with self.engines[source].begin() as src:
+            for table, criteria in reversed(scoped):
+                src.execute(delete(table).where(criteria))
+
+        logger.info(f"Moved college {college_id} from {source} to {target}: {moved}")
+        return moved
+
+    def pin(self, college_id: str, shard: str):
+        """Record `college_id` as living on `shard`."""
+        with self._directory_lock:
+            # Start from the file so pins written by other processes are kept
+            directory, _ = self._load_directory()
+            directory[college_id] = shard
+            self._directory = directory
+            self._save_directory()
+            self._directory_mtime = self._directory_file_mtime()
+
+    def _current_directory(self) -> dict:
+        if self.directory_file and self._directory_file_mtime() != self._directory_mtime:
+            with self._directory_lock:
+                self._directory, self._directory_mtime = self._load_directory()
+        return self._directory
+
+    def _directory_file_mtime(self):
+        try:
+            return stat(self.directory_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_directory(self) -> tuple:
+        # Returns the directory and the mtime of the file it was read from
+        mtime = self._directory_file_mtime() if self.directory_file else None
+        if mtime is None:
+            return {}, None
+        with open(self.directory_file, encoding="utf-8") as directory:
+            return json.load(directory), mtime
+
+    def _save_directory(self):
+        if not self.directory_file:
+            return
+        temp_file = f"{self.directory_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as directory:
+            json.dump(self._directory, directory, indent=2, sort_keys=True)
+        replace(temp_file, self.directory_file)
@@ -0,0 +1,372 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from glob import escape, glob
+from os import getpid, kill, name as os_name, remove, replace
+from os.path import exists, splitext
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import String, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from src.utils.generators import generate_id
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = Gauge(
+    "write_behind_queue_depth", "Records accepted but not yet written", ["buffer"]
+)
+FLUSH_LATENCY = Histogram(
+    "write_behind_flush_seconds", "Time taken to write one batch", ["buffer"]
+)
+FLUSHED_RECORDS = Counter(
+    "write_behind_flushed_records_total", "Records written to the database", ["buffer"]
+)
+DROPPED_RECORDS = Counter(
+    "write_behind_dropped_records_total", "Records rejected by the database", ["buffer"]
+)
+REJECTED_RECORDS = Counter(
+    "write_behind_rejected_records_total", "Records refused because the queue was full", ["buffer"]
+)
+
+
+class BufferFull(Exception):
+    """Raised by `WriteBehindBuffer.submit` when `max_depth` records are already waiting."""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not journal serialisable")
+
+
+def _decode(obj: dict):
+    if "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def _process_alive(pid: int) -> bool:
+    if os_name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        alive = kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)) and exit_code.value == 259
+        kernel32.CloseHandle(handle)
+        return bool(alive)
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindBuffer:
+    """
+    Accepts rows for a fixed set of models, acknowledges them immediately and
+    inserts them in batches from a background thread.
+
+    A batch is flushed when `batch_size` records are waiting or every
+    `flush_interval` seconds, whichever comes first. At most `max_depth`
+    records are queued; `submit` raises `BufferFull` beyond that.
+
+    Pending records are appended to a per-process journal derived from
+    `journal_file` (`write_behind.journal` -> `write_behind.<pid>.journal`).
+    Each flush appends a marker for the records it took off the queue, and
+    the journal is compacted once markers outweigh the records still waiting.
+    The journal is only opened by `start`, which first replays this process's
+    leftover journal and those left behind by processes that are no longer
+    running; a process that never starts the buffer leaves journals alone.
+
+    When `route` is given, `route(records)` returns the records of a batch
+    grouped by the sessionmaker to write them with, e.g. one per shard;
+    otherwise everything is written with `session_factory`.
+    """
+
+    def __init__(self, name: str, session_factory, models: list, batch_size: int = 100,
+                 flush_interval: float = 2.0, journal_file: str = None, max_depth: int = 100000,
+                 compact_after: int = 10000, route=None):
+        self.name = name
+        self.session_factory = session_factory
+        self.route = route
+        self.models = {model.__tablename__: model for model in models}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.compact_after = compact_after
+        self.journal_base = journal_file
+        self.journal_file = None
+        if journal_file:
+            root, ext = splitext(journal_file)
+            self.journal_file = f"{root}.{getpid()}{ext}"
+
+        self._pending = deque()  # Journal lines, oldest first
+        self._lock = threading.Lock()  # Guards _pending and the journal file
+        self._flush_lock = threading.Lock()  # Only one flush at a time
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._journal = None
+        self._journal_done = 0  # Records marked done in the journal since it was compacted
+        self._flush_listeners = []
+        self._replayed = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def submit(self, model, **values) -> dict:
+        """
+        Queue a row for `model` and return the values that will be written,
+        including the generated id and any Python-side column defaults.
+        """
+        table = model.__tablename__
+        if table not in self.models:
+            raise ValueError(f"{table} is not handled by the {self.name} buffer")
+
+        for column in model.__table__.columns:
+            if column.key in values:
+                continue
+            if column.key == "id" and isinstance(column.type, String):
+                values["id"] = generate_id()
+            elif column.default is not None and column.default.is_callable:
+                values[column.key] = column.default.arg(None)
+            elif column.default is not None and column.default.is_scalar:
+                values[column.key] = column.default.arg
+
+        line = json.dumps({"table": table, "values": values}, default=_encode)  # Fail fast on unserialisable values
+
+        with self._lock:
+            if len(self._pending) >= self.max_depth:
+                REJECTED_RECORDS.labels(self.name).inc()
+                raise BufferFull(f"{self.name} buffer already holds {self.max_depth} records")
+            self._pending.append(line)
+            if self._journal:
+                self._journal.write(line + "\n")
+                self._journal.flush()
+            depth = len(self._pending)
+
+        QUEUE_DEPTH.labels(self.name).set(depth)
+        if depth >= self.batch_size:
+            self._wakeup.set()
+        return values
+
+    def flush(self) -> int:
+        """
+        Write up to one batch of pending records. Returns the number of
+        records taken off the queue. On a connection failure the unwritten
+        records are put back at the front of the queue and retried on the
+        next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                size = min(self.batch_size, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(size)]
+            if not batch:
+                return 0
+
+            records = [json.loads(line, object_hook=_decode) for line in batch]
+            start = time.perf_counter()
+            try:
+                self._write(records)
+                done = len(batch)
+            except (IntegrityError, DataError):
+                # One bad row must not block the rest of the queue
+                done = self._write_one_by_one(records)
+            except Exception as e:
+                logger.error(f"Write-behind flush for {self.name} failed: {str(e)}")
+                done = 0
+            if done:
+                FLUSH_LATENCY.labels(self.name).observe(time.perf_counter() - start)
+
+            with self._lock:
+                self._pending.extendleft(reversed(batch[done:]))
+                self._mark_done(done)
+                depth = len(self._pending)
+            QUEUE_DEPTH.labels(self.name).set(depth)
+
+            for listener in self._flush_listeners if done else ():
+                try:
+                    listener(records[:done])
+                except Exception as e:
+                    logger.error(f"Write-behind flush listener for {self.name} failed: {str(e)}")
+            return done
+
+    def add_flush_listener(self, listener):
+        """
+        Call `listener(records)` after each flush with the records taken off
+        the queue, as {"table": ..., "values": ...} dicts. Core inserts skip
+        the ORM session events, so this is how caches learn about new rows.
+        """
+        self._flush_listeners.append(listener)
+
+    def start(self):
+        """Replay leftover journals, open this process's journal and start the flush thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        if self.journal_base and self._journal is None:
+            self._open_journal()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"write-behind-{self.name}", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Stop the flush thread and drain whatever is still queued. The journal
+        is removed once empty, otherwise kept for the next start-up to replay.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        while self._pending and self.flush():
+            pass
+
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+                if not self._pending:
+                    remove(self.journal_file)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # Keep going while full batches are waiting
+            while self.flush() >= self.batch_size:
+                pass
+
+    def _write(self, records: list):
+        # If a later shard fails, the retry one by one re-inserts the rows
+        # already committed elsewhere; their primary keys turn those into drops
+        routed = self.route(records) if self.route else {self.session_factory: records}
+        for session_factory, shard_records in routed.items():
+            rows_by_table = defaultdict(list)
+            for record in shard_records:
+                rows_by_table[record["table"]].append(record["values"])
+
+            with session_factory() as dbsession:
+                for table, rows in rows_by_table.items():
+                    dbsession.execute(insert(self.models[table]), rows)
+                dbsession.commit()
+        FLUSHED_RECORDS.labels(self.name).inc(len(records))
+
+    def _write_one_by_one(self, records: list) -> int:
+        # Returns how many records, from the front, were written or dropped
+        for index, record in enumerate(records):
+            try:
+                self._write([record])
+            except (IntegrityError, DataError) as e:
+                DROPPED_RECORDS.labels(self.name).inc()
+                logger.error(f"Write-behind dropped {record['table']} row: {str(e)}")
+            except Exception as e:
+                logger.error(f"Write-behind flush for {self.name} failed: {str(e)}")
+                return index
+        return len(records)
+
+    def _mark_done(self, done: int):
+        # Caller holds self._lock. Records leave the queue in journal order,
+        # so a count is enough to tell replay which ones to skip.
+        if not self._journal or not done:
+            return
+        self._journal_done += done
+        if not self._pending or self._journal_done >= max(self.compact_after, 4 * len(self._pending)):
+            self._compact_journal()
+        else:
+            self._journal.write(json.dumps({"$done": done}) + "\n")
+            self._journal.flush()
+
+    def _compact_journal(self):
+        # Caller holds self._lock
+        self._journal.close()
+        temp_file = f"{self.journal_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as journal:
+            journal.writelines(line + "\n" for line in self._pending)
+        replace(temp_file, self.journal_file)
+        self._journal = open(self.journal_file, "a", encoding="utf-8")
+        self._journal_done = 0
+
+    def _open_journal(self):
+        # Journals are claimed once per process; a restart after stop() keeps
+        # what is already queued in memory
+        claimed, replayed = ([], []) if self._replayed else self._claim_journals()
+        self._replayed = True
+
+        with self._lock:
+            # Replayed records go first; anything submitted before start()
+            # joins them in the compacted journal
+            self._pending.extendleft(reversed(replayed))
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+            self._compact_journal()
+            depth = len(self._pending)
+        for claim in claimed:
+            remove(claim)
+
+        QUEUE_DEPTH.labels(self.name).set(depth)
+        if replayed:
+            logger.info(f"Replayed {len(replayed)} {self.name} records from {len(claimed)} journal(s)")
+
+    def _claim_journals(self) -> tuple:
+        # Returns the claimed journal paths and the records still pending in them
+        journal_file = self.journal_base
+        root, ext = splitext(journal_file)
+        own_pid = str(getpid())
+        claimed = []
+        replayed = []
+
+        # Journals are named <root>.<pid>[.<claim>]<ext>; the one without a
+        # pid predates per-process journals
+        for path in [journal_file] + sorted(glob(f"{escape(root)}.*{ext}")):
+            if not exists(path):
+                continue
+            if path != journal_file:
+                owner = path[len(root) + 1:len(path) - len(ext)].split(".")[0]
+                if not owner.isdigit():
+                    continue
+                # A journal carrying our pid was left by an earlier process
+                if owner != own_pid and _process_alive(int(owner)):
+                    continue
+            # Renaming claims the journal; a process that loses the race skips it
+            claim = f"{root}.{own_pid}.{generate_id()[:8]}{ext}"
+            try:
+                replace(path, claim)
+            except FileNotFoundError:
+                continue
+            claimed.append(claim)
+            replayed.extend(self._read_journal(claim))
+        return claimed, replayed
+
+    def _read_journal(self, path: str) -> list:
+        lines = []
+        done = 0
+        with open(path, encoding="utf-8") as journal:
+            for line in journal:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    logger.warning(f"Skipping unreadable journal line in {path}")
+                    continue
+                if "$done" in record:
+                    done += record["$done"]
+                else:
+                    lines.append(line)
+        return lines[done:]
@@ -1,6 +1,6 @@
 from os import environ
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 
@@ -8,20 +8,78 @@ from src.dbModels.SchemaModels import (
     User, College, Event, Sponsorship, Achievement, Match,
     GameCategory, Participant, Team, Schedule, Venue, Certificate
 )
+from src.dbModels.AnalyticsModels import ActivityFact, ParticipationRollup, RollupWatermark
+from src.dbModels.Analytics import ActivityRecorder, RollupScheduler
 from src.dbModels.BaseModel import Base
+from src.dbModels.SchemaModels import Base as SchemaBase
+from src.dbModels.Sharding import DEFAULT_SHARD, ShardRouter
+from src.dbModels.WriteBehind import WriteBehindBuffer
 from src.utils.pre_loader import config
 
+
+def _create_engine(url: str):
+    connect_args = {}
+    if make_url(url).get_driver_name() == "psycopg":
+        # psycopg 3 prepares a statement server-side after this many executions
+        connect_args["prepare_threshold"] = config.getint("database", "prepare_threshold", fallback=5)
+
+    return create_engine(
+        url,
+        echo=(config.getboolean("database", "echo")),
+        poolclass=QueuePool,  # Use QueuePool for connection pooling
+        pool_size=config.getint("database", "pool_size", fallback=5),
+        max_overflow=config.getint("database", "max_overflow", fallback=10),
+        pool_timeout=config.getint("database", "pool_timeout", fallback=30),
+        query_cache_size=config.getint("database", "query_cache_size", fallback=500),
+        connect_args=connect_args,
+    )
+
+
 # Corrected SQLite URL for a relative path
-_engine = create_engine(
-    environ.get("SQLALCHEMY_DATABASE_URI"),
-    echo=(config.getboolean("database", "echo")),
-    poolclass=QueuePool,  # Use QueuePool for connection pooling
-    pool_size=config.getint("database", "pool_size", fallback=5),
-    max_overflow=config.getint("database", "max_overflow", fallback=10),
-    pool_timeout=config.getint("database", "pool_timeout", fallback=30),
-)
+_engine = _create_engine(environ.get("SQLALCHEMY_DATABASE_URI"))
 
 # Create tables
 Base.metadata.create_all(_engine)
 
 dbSession = sessionmaker(bind=_engine)
+
+# College-scoped data shards. The "default" shard is the main database, the
+# others are read from SHARD_<NAME>_DATABASE_URI.
+shardRouter = ShardRouter(
+    {
+        name: _engine if name == DEFAULT_SHARD
+        else _create_engine(environ.get(f"SHARD_{name.upper()}_DATABASE_URI"))
+        for name in config.get("sharding", "shards", fallback=DEFAULT_SHARD).replace(" ", "").split(",")
+    },
+    directory_file=config.get("sharding", "directory_file", fallback=None),
+)
+
+# Every shard gets the full schema; reference rows are copied over by
+# `rebalance.py --sync-reference`
+for _shard_engine in shardRouter.engines.values():
+    SchemaBase.metadata.create_all(_shard_engine)
+
+# Buffered writes for high-volume per-user activity (flushed in batches,
+# each row on its user's shard)
+activityBuffer = WriteBehindBuffer(
+    "activity",
+    dbSession,
+    [Achievement, Participant, ActivityFact],
+    batch_size=config.getint("write_behind", "batch_size", fallback=100),
+    flush_interval=config.getfloat("write_behind", "flush_interval", fallback=2.0),
+    journal_file=config.get("write_behind", "journal_file", fallback=None),
+    max_depth=config.getint("write_behind", "max_depth", fallback=100000),
+    route=shardRouter.route_records,
+)
+
+# Activity facts for the participation analytics, written through activityBuffer
+activityRecorder = ActivityRecorder(activityBuffer)
+
+# Periodically folds new activity facts into the participation rollups,
+# looking up each user's college on their shard
+rollupScheduler = RollupScheduler(
+    dbSession,
+    interval=config.getfloat("analytics", "rollup_interval", fallback=300),
+    settle_seconds=config.getint("analytics", "settle_seconds", fallback=60),
+    colleges_for=shardRouter.user_colleges,
+)
@@ -1,16 +1,22 @@
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
-from src.dbModels import dbSession, User
+from src.dbModels import activityBuffer, rollupScheduler, shardRouter
+from src.dbModels.HotQueries import user_by_id
 from src.utils.pre_loader import config
 from src.flasky.session import app_session
 from datetime import timedelta
-from flask import Flask, request, abort
+from flask import Flask, request
 from flask_cors import CORS
 from os import environ
 from src.flasky.fetch.user import app_fetch
+from src.flasky.fetch.calendar import app_calendar
+from src.flasky.fetch.batch import app_batch
+from src.flasky.fetch.analytics import app_analytics
 import logging
 from os.path import join
-from src.flasky.errors import app_error
-from .utils import root_path, metrics, jwt, oauth, limiter
+from src.flasky.errors import app_error, prerender_error_pages
+from src.flasky.assets import init_assets, is_static_or_error_request
+from src.flasky.profiling import app_profiling, init_tracing
+from .utils import root_path, metrics, jwt, oauth, limiter, require_metrics_token
 
 
 class CustomLogger(logging.Logger):
@@ -72,14 +78,25 @@ def create_app():
     # Enable PrometheusMetrics for Montoring
     metrics.init_app(app)
 
+    # Static files and unmatched routes skip rate limiting and request metrics
+    limiter.request_filter(is_static_or_error_request)
+
+    @app.before_request
+    def skip_static_and_error_metrics():
+        if is_static_or_error_request():
+            request.prom_do_not_track = True
+
+    # Fingerprinted, precompressed static files served from /assets
+    init_assets(app)
+
     @app.route("/metrics")
     @limiter.exempt
     def secure_prometheus_metrics():
-        auth_token = request.headers.get("Authorization")
-        if auth_token == f"Bearer {environ.get('PROMETHEUS_TOKEN')}":
-            return generate_latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
-        else:
-            abort(403, "Forbidden")
+        require_metrics_token()
+        return generate_latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+    # Header-enabled per-request span timings
+    init_tracing(app, jwt)
 
     app.secret_key = environ.get("FLASK_SESSION_KEY")
     if not app.secret_key:
@@ -101,31 +118,40 @@ def create_app():
 
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
-        """Fetch the user from the database based on the JWT identity."""
+        """Fetch the user from their college's shard based on the JWT identity."""
         identity = jwt_data["sub"]
-        with dbSession() as dbsession:
-            user = dbsession.query(User).filter(User.id == identity).one_or_none()
-            if not user:
-                return None
-        return user
+        # Tokens issued before the college_id claim existed search every shard
+        return shardRouter.for_user(
+            lambda dbsession: user_by_id(dbsession, identity), jwt_data.get("college_id")
+        )
 
     # Register Flask Blueprints
     app.register_blueprint(app_session)
     app.register_blueprint(app_fetch)
+    app.register_blueprint(app_calendar)
+    app.register_blueprint(app_batch)
+    app.register_blueprint(app_analytics)
     app.register_blueprint(app_error)
+    app.register_blueprint(app_profiling)
+
+    # Start flushing buffered activity writes and rolling up analytics
+    activityBuffer.start()
+    rollupScheduler.start()
 
     # Configure OAuth
     oauth.init_app(app)
 
     # Register Google OAuth
+    # Endpoints and signing keys come from the (cached) discovery document
     oauth.register(
         name="google",
         client_id=environ.get("GOOGLE_CLIENT_ID"),
         client_secret=environ.get("GOOGLE_CLIENT_SECRET"),
-        access_token_url="https://accounts.google.com/o/oauth2/token",
-        authorize_url="https://accounts.google.com/o/oauth2/auth",
-        api_base_url="https://www.googleapis.com/oauth2/v1/",
-        jwks_uri="https://www.googleapis.com/oauth2/v3/certs",
+        server_metadata_url=config.get(
+            "oauth",
+            "google_metadata_url",
+            fallback="https://accounts.google.com/.well-known/openid-configuration",
+        ),
         client_kwargs={"scope": "openid email profile"},
     )
 
@@ -140,4 +166,10 @@ def create_app():
         client_kwargs={"scope": "email public_profile"},
     )
 
+    # Keep provider discovery documents and JWKS warm
+    oauth.start_refresh()
+
+    # Render error pages once, after every template global is registered
+    prerender_error_pages(app)
+
     return app
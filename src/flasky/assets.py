@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import mimetypes
+from os import walk
+from os.path import join, relpath, splitext
+
+from flask import Blueprint, abort, current_app, request
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are optional
+    brotli = None
+
+# Create the Blueprint
+app_assets = Blueprint("assets", __name__, url_prefix="/assets")
+
+# Formats that are already compressed
+INCOMPRESSIBLE = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2", ".gz", ".br", ".zip"}
+
+
+class AssetManifest:
+    """
+    Fingerprinted copies of the files under `static/`, held in memory with
+    precompressed variants.
+
+    `images/icon.ico` is served as `/assets/images/icon.<hash>.ico`; since the
+    name changes with the content, responses can be cached forever.
+    """
+
+    def __init__(self):
+        self.urls = {}  # Original path -> fingerprinted path
+        self.files = {}  # Fingerprinted path -> (mimetype, digest, {encoding: bytes})
+
+    def build(self, static_folder: str):
+        self.urls.clear()
+        self.files.clear()
+        for directory, _, filenames in walk(static_folder):
+            for filename in filenames:
+                path = relpath(join(directory, filename), static_folder).replace("\\", "/")
+                with open(join(directory, filename), "rb") as file:
+                    data = file.read()
+
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, extension = splitext(path)
+                fingerprinted = f"{stem}.{digest}{extension}"
+
+                variants = {"identity": data}
+                if extension.lower() not in INCOMPRESSIBLE:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                    if len(compressed) < len(data):
+                        variants["gzip"] = compressed
+                    if brotli is not None:
+                        compressed = brotli.compress(data)
+                        if len(compressed) < len(data):
+                            variants["br"] = compressed
+
+                mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                self.urls[path] = fingerprinted
+                self.files[fingerprinted] = (mimetype, digest, variants)
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL for a static file, or its plain /static URL if unknown."""
+        fingerprinted = self.urls.get(path)
+        if fingerprinted is None:
+            return f"/static/{path}"
+        return f"/assets/{fingerprinted}"
+
+
+manifest = AssetManifest()
+
+
+def init_assets(app):
+    """Fingerprint the app's static folder and expose `asset_url` to templates."""
+    manifest.build(app.static_folder)
+    app.jinja_env.globals["asset_url"] = manifest.url
+    app.register_blueprint(app_assets)
+
+
+def is_static_or_error_request() -> bool:
+    """Requests that skip rate limiting and request metrics."""
+    return request.endpoint in (None, "static", "assets.asset") or request.blueprint == "error"
+
+
+@app_assets.route("/<path:filename>")
+def asset(filename: str):
+    """
+    Serve a fingerprinted static file in the best encoding the client accepts.
+    """
+    entry = manifest.files.get(filename)
+    if entry is None:
+        abort(404)
+    mimetype, digest, variants = entry
+
+    encoding = "identity"
+    for candidate in ("br", "gzip"):
+        if candidate in variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+
+    response = current_app.response_class(variants[encoding], mimetype=mimetype)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(f"{digest}-{encoding}")
+    return response.make_conditional(request)
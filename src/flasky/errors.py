@@ -1,32 +1,77 @@
-from flask import Blueprint, render_template, abort, current_app
+import json
+
+from flask import Blueprint, render_template, abort, current_app, request
 
 # Create the Blueprint
 app_error = Blueprint("error", __name__, url_prefix="/error")
 
+ERROR_PAGES = {
+    401: ("errors/unauthorised.html", "Unauthorised"),
+    403: ("errors/forbidden.html", "Forbidden"),
+    404: ("errors/page_not_found.html", "Not found"),
+    500: ("errors/internal_server_error.html", "Internal server error"),
+}
+
+# Status code -> (HTML body, JSON body), filled by prerender_error_pages
+_rendered = {}
+
+
+def _render(status: int):
+    template, message = ERROR_PAGES[status]
+    _rendered[status] = (
+        render_template(template).encode(),
+        json.dumps({"msg": message}).encode(),
+    )
+
+
+def prerender_error_pages(app):
+    """
+    Render every error page once per worker so the handlers below never go
+    through Jinja.
+    """
+    with app.test_request_context():
+        for status in ERROR_PAGES:
+            _render(status)
+
+
+def error_response(status: int):
+    """
+    Prebuilt error body for `status`: JSON for clients that prefer it, the
+    HTML page otherwise.
+    """
+    if status not in _rendered:
+        _render(status)
+    html, body = _rendered[status]
+
+    best = request.accept_mimetypes.best_match(["text/html", "application/json"])
+    if best == "application/json":
+        response = current_app.response_class(body, status, mimetype="application/json")
+    else:
+        response = current_app.response_class(html, status, mimetype="text/html")
+    response.headers["Vary"] = "Accept"
+    return response
+
 
 @app_error.app_errorhandler(401)
 def unauthorised(e):
-    return render_template("errors/unauthorised.html"), 401
+    return error_response(401)
 
 
 @app_error.app_errorhandler(403)
 def forbidden(e):
-    return render_template("errors/forbidden.html"), 403
+    return error_response(403)
 
 
 # Handle 404 errors
 @app_error.app_errorhandler(404)
 def page_not_found(e):  # Add 'e' to accept the error
-    return (
-        render_template("errors/page_not_found.html"),
-        404,
-    )  # Include status code 404 in the return
+    return error_response(404)
 
 
 # Handle 500 errors
 @app_error.app_errorhandler(500)
 def internal_server_error(e):
-    return render_template("errors/internal_server_error.html"), 500  # Add status code
+    return error_response(500)
 
 
 # Trigger an error route
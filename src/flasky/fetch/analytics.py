@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+from src.dbModels import dbSession
+from src.dbModels.Analytics import participation_series
+
+app_analytics = Blueprint("analytics", __name__, url_prefix="/fetch/analytics")
+
+
+@app_analytics.route("/participation")
+@jwt_required()
+def fetch_participation():
+    """
+    Return participation and match counts over time for the dashboard.
+    Expects start and end (YYYY-MM-DD, end exclusive), and optionally dimension
+    (all, game_category, college, event), id and granularity (day, week, month).
+    """
+    try:
+        start = datetime.strptime(request.args.get("start", ""), "%Y-%m-%d")
+        end = datetime.strptime(request.args.get("end", ""), "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"msg": "start and end must be YYYY-MM-DD dates"}), 400
+
+    dimension = request.args.get("dimension", "all")
+    dimension_id = request.args.get("id", "")
+    if dimension != "all" and not dimension_id:
+        return jsonify({"msg": f"id is required for the {dimension} dimension"}), 400
+
+    try:
+        # Facts and rollups are not college-scoped; they live on the default shard
+        with dbSession() as dbsession:
+            series = participation_series(
+                dbsession, start, end, dimension, dimension_id, request.args.get("granularity")
+            )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify(series), 200
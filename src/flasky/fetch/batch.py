@@ -0,0 +1,67 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import current_user, jwt_required
+from src.dbModels import shardRouter
+from src.dbModels.Loader import BatchLoader
+
+app_batch = Blueprint("batch", __name__, url_prefix="/fetch/batch")
+
+MAX_BATCH_SIZE = 100
+
+
+def _invalid_entry(entry) -> str:
+    """Why `entry` is not a valid batch request, or None if it is."""
+    if not isinstance(entry, dict):
+        return "each request must be an object"
+    if not isinstance(entry.get("type"), str):
+        return "type must be a string"
+    if not isinstance(entry.get("id"), str):
+        # Every primary key is a string; other types would never match and
+        # make PostgreSQL reject the IN (...) comparison
+        return "id must be a string"
+    include = entry.get("include") or []
+    if not isinstance(include, list) or not all(isinstance(relation, str) for relation in include):
+        return "include must be a list of relation names"
+    return None
+
+
+@app_batch.route("/", methods=["POST"])
+@jwt_required()
+def fetch_batch():
+    """
+    Fetch many entities in one call.
+    Expects JSON like {"requests": [{"type": "user", "id": "...", "include": ["college", "achievements"]}]}.
+    Returns one result per request, in order, and loader statistics. Users,
+    achievements and participants outside the caller's college come back as
+    null, and only each entity's public fields are returned.
+    """
+    payload = request.get_json(silent=True) or {}
+    entries = payload.get("requests")
+
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"msg": "A non-empty requests list is required"}), 400
+    if len(entries) > MAX_BATCH_SIZE:
+        return jsonify({"msg": f"At most {MAX_BATCH_SIZE} requests per batch"}), 400
+
+    for index, entry in enumerate(entries):
+        error = _invalid_entry(entry)
+        if error:
+            return jsonify({"msg": f"Invalid request {index}: {error}"}), 400
+
+    with shardRouter.session(current_user.college_id) as dbsession:
+        loader = BatchLoader(dbsession, current_user.college_id, shardRouter)
+        try:
+            for entry in entries:
+                loader.load(entry["type"], entry["id"], entry.get("include") or [])
+        except ValueError as e:
+            return jsonify({"msg": f"Invalid request: {str(e)}"}), 400
+        loader.dispatch()
+
+    results = [
+        {
+            "type": entry["type"],
+            "id": entry["id"],
+            "data": loader.resolve(entry["type"], entry["id"], entry.get("include") or []),
+        }
+        for entry in entries
+    ]
+    return jsonify(results=results, stats=loader.stats), 200
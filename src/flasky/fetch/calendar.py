@@ -0,0 +1,342 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+
+from flask import Blueprint, abort, make_response, request
+from sqlalchemy import and_, event, inspect, or_, select
+from sqlalchemy.orm import Session, joinedload
+
+from src.dbModels import (
+    Event, Match, Participant, Schedule, Team, Venue, activityBuffer, dbSession, shardRouter
+)
+from src.utils.pre_loader import config
+
+app_calendar = Blueprint("calendar", __name__, url_prefix="/fetch/calendar")
+
+CONTENT_TYPES = {
+    "ics": "text/calendar; charset=utf-8",
+    "json": "application/json",
+}
+
+
+class FeedCache:
+    """
+    Rendered feed bytes keyed by (kind, id, format).
+
+    Every feed has a version that is bumped when a committed change touches
+    it; an entry is reused only while its version is current and it is
+    younger than `max_age` seconds (which bounds staleness for changes made by
+    other worker processes). The ETag is a hash of the feed's content rather
+    than of the rendered bytes (which carry a generation timestamp), so it is
+    the same across workers and restarts.
+    """
+
+    def __init__(self, max_age: int):
+        self.max_age = max_age
+        self._versions = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def current(self, kind: str, feed_id: str, fmt: str):
+        """Return the cached (etag, body) for a feed, or None if it must be rendered."""
+        with self._lock:
+            entry = self._entries.get((kind, feed_id, fmt))
+            version = self._versions.get((kind, feed_id), 0)
+        if entry is None:
+            return None
+        entry_version, rendered_at, etag, body = entry
+        if entry_version != version or time.monotonic() - rendered_at > self.max_age:
+            return None
+        return etag, body
+
+    def store(self, kind: str, feed_id: str, fmt: str, body: bytes, content: bytes, version: int):
+        etag = hashlib.sha1(fmt.encode() + content).hexdigest()
+        with self._lock:
+            # Skip if an invalidation arrived while rendering
+            if self._versions.get((kind, feed_id), 0) == version:
+                self._entries[(kind, feed_id, fmt)] = (version, time.monotonic(), etag, body)
+        return etag, body
+
+    def version(self, kind: str, feed_id: str) -> int:
+        with self._lock:
+            return self._versions.get((kind, feed_id), 0)
+
+    def invalidate(self, feeds: set):
+        with self._lock:
+            for feed in feeds:
+                self._versions[feed] = self._versions.get(feed, 0) + 1
+
+
+feedCache = FeedCache(config.getint("calendar", "max_age", fallback=300))
+
+
+# Invalidation
+# Feeds touched by a flush are collected on the session and only invalidated
+# once the transaction commits.
+
+
+def _history(obj, attribute: str) -> set:
+    """Current and previous values of `attribute` on a flushed object."""
+    values = set(inspect(obj).attrs[attribute].history.deleted or ())
+    values.add(getattr(obj, attribute))
+    values.discard(None)
+    return values
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched_feeds(dbsession, flush_context):
+    feeds = set()
+    match_ids = set()
+    times = set()
+
+    for obj in chain(dbsession.new, dbsession.dirty, dbsession.deleted):
+        if isinstance(obj, Schedule):
+            feeds |= {("venue", venue_id) for venue_id in _history(obj, "venue_id")}
+            match_ids |= _history(obj, "match_id")
+            times |= _history(obj, "start_time")
+        elif isinstance(obj, Match):
+            match_ids.add(obj.id)
+        elif isinstance(obj, Participant):
+            feeds |= {("team", team_id) for team_id in _history(obj, "team_id")}
+        elif isinstance(obj, Venue):
+            feeds.add(("venue", obj.id))
+        elif isinstance(obj, Team):
+            feeds.add(("team", obj.id))
+        elif isinstance(obj, Event):
+            feeds.add(("event", obj.id))
+
+    if match_ids:
+        for venue_id, start_time in dbsession.execute(
+            select(Schedule.venue_id, Schedule.start_time).where(Schedule.match_id.in_(match_ids))
+        ):
+            feeds.add(("venue", venue_id))
+            times.add(start_time)
+        team_ids = select(Participant.team_id).where(
+            Participant.match_id.in_(match_ids), Participant.team_id.is_not(None)
+        )
+        feeds |= {("team", team_id) for team_id in dbsession.scalars(team_ids)}
+        # Participants on the other shards can be on these matches' teams too
+        other_shards = [
+            name for name, engine in shardRouter.engines.items() if engine is not dbsession.get_bind()
+        ]
+        if other_shards:
+            results = shardRouter.scatter(
+                lambda shard_session: shard_session.scalars(team_ids).all(), other_shards
+            )
+            feeds |= {("team", team_id) for team_id in chain.from_iterable(results.values())}
+    if times:
+        feeds |= {
+            ("event", event_id)
+            for event_id in dbsession.scalars(
+                select(Event.id).where(
+                    or_(*(and_(Event.start_date <= t, Event.end_date >= t) for t in times))
+                )
+            )
+        }
+
+    if feeds:
+        dbsession.info.setdefault("calendar_feeds", set()).update(feeds)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_touched_feeds(dbsession):
+    feeds = dbsession.info.pop("calendar_feeds", None)
+    if feeds:
+        feedCache.invalidate(feeds)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_touched_feeds(dbsession):
+    dbsession.info.pop("calendar_feeds", None)
+
+
+def _invalidate_buffered_feeds(records: list):
+    # Participants written by activityBuffer are Core inserts, which skip the
+    # session events above
+    feeds = {
+        ("team", record["values"]["team_id"])
+        for record in records
+        if record["table"] == Participant.__tablename__ and record["values"].get("team_id")
+    }
+    if feeds:
+        feedCache.invalidate(feeds)
+
+
+activityBuffer.add_flush_listener(_invalidate_buffered_feeds)
+
+
+# Rendering
+
+
+def _schedules(dbsession, *criteria) -> list:
+    statement = (
+        select(Schedule)
+        .options(
+            joinedload(Schedule.match).joinedload(Match.game_category),
+            joinedload(Schedule.venue),
+        )
+        .where(*criteria)
+        .order_by(Schedule.start_time, Schedule.id)
+    )
+    return [
+        {
+            "id": schedule.id,
+            "match_id": schedule.match_id,
+            "status": schedule.match.status,
+            "game_category": schedule.match.game_category.name,
+            "venue": schedule.venue.name,
+            "location": schedule.venue.location,
+            "start_time": schedule.start_time,
+            "end_time": schedule.end_time,
+        }
+        for schedule in dbsession.scalars(statement).unique()
+    ]
+
+
+def _team_match_ids(team_id: str) -> set:
+    # Team members can come from several colleges, so their participant rows
+    # are spread across shards
+    results = shardRouter.scatter(
+        lambda dbsession: dbsession.scalars(
+            select(Participant.match_id).where(Participant.team_id == team_id)
+        ).all()
+    )
+    return set(chain.from_iterable(results.values()))
+
+
+def _load_feed(kind: str, feed_id: str):
+    """Return (title, entries) for a feed, or None if its subject does not exist."""
+    # Venues, teams, events and schedules are reference tables on the default shard
+    with dbSession() as dbsession:
+        if kind == "venue":
+            venue = dbsession.get(Venue, feed_id)
+            if venue is None:
+                return None
+            return venue.name, _schedules(dbsession, Schedule.venue_id == feed_id)
+        if kind == "team":
+            team = dbsession.get(Team, feed_id)
+            if team is None:
+                return None
+            return team.name, _schedules(dbsession, Schedule.match_id.in_(_team_match_ids(feed_id)))
+        if kind == "event":
+            event_row = dbsession.get(Event, feed_id)
+            if event_row is None:
+                return None
+            return event_row.name, _schedules(
+                dbsession,
+                Schedule.start_time >= event_row.start_date,
+                Schedule.start_time <= event_row.end_date,
+            )
+    return None
+
+
+def _ics_escape(value: str) -> str:
+    return (
+        str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _ics_time(value) -> str:
+    # Schedule times are stored as naive UTC
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ics_fold(line: str) -> str:
+    # RFC 5545 3.1: content lines longer than 75 octets are folded with CRLF
+    # and a space, without splitting a UTF-8 character
+    parts = []
+    current = ""
+    size = 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append(current)
+            current = " "
+            size = 1
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts)
+
+
+def render_ics(title: str, entries: list) -> bytes:
+    generated_at = _ics_time(datetime.utcnow())
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Sylvan//Schedule//EN",
+        f"X-WR-CALNAME:{_ics_escape(title)}",
+    ]
+    for entry in entries:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{entry['id']}@sylvan",
+            f"DTSTAMP:{generated_at}",
+            f"DTSTART:{_ics_time(entry['start_time'])}",
+            f"DTEND:{_ics_time(entry['end_time'])}",
+            f"SUMMARY:{_ics_escape(entry['game_category'])} ({_ics_escape(entry['status'])})",
+            f"LOCATION:{_ics_escape(entry['venue'])}\\, {_ics_escape(entry['location'])}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_ics_fold(line) for line in lines) + "\r\n").encode()
+
+
+def render_json(title: str, entries: list) -> bytes:
+    return json.dumps({"name": title, "schedules": entries}, default=lambda value: value.isoformat()).encode()
+
+
+RENDERERS = {"ics": render_ics, "json": render_json}
+
+
+def serve_feed(kind: str, feed_id: str, fmt: str):
+    """
+    Serve a feed from the cache when possible, answering 304 if the client
+    already has the current version.
+    """
+    cached = feedCache.current(kind, feed_id, fmt)
+    if cached is None:
+        version = feedCache.version(kind, feed_id)
+        feed = _load_feed(kind, feed_id)
+        if feed is None:
+            abort(404)
+        content = render_json(*feed)
+        body = content if fmt == "json" else RENDERERS[fmt](*feed)
+        cached = feedCache.store(kind, feed_id, fmt, body, content, version)
+    etag, body = cached
+
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(body, 200)
+        response.headers["Content-Type"] = CONTENT_TYPES[fmt]
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # Always revalidate
+    return response
+
+
+@app_calendar.route("/venue/<string:venue_id>.<any(ics, json):fmt>")
+def venue_feed(venue_id: str, fmt: str):
+    """
+    Schedule feed for one venue.
+    """
+    return serve_feed("venue", venue_id, fmt)
+
+
+@app_calendar.route("/team/<string:team_id>.<any(ics, json):fmt>")
+def team_feed(team_id: str, fmt: str):
+    """
+    Schedule feed for the matches a team takes part in.
+    """
+    return serve_feed("team", team_id, fmt)
+
+
+@app_calendar.route("/event/<string:event_id>.<any(ics, json):fmt>")
+def event_feed(event_id: str, fmt: str):
+    """
+    Schedule feed for the matches that start within an event's dates.
+    """
+    return serve_feed("event", event_id, fmt)
@@ -1,20 +1,21 @@
 from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy.orm import joinedload
-from src.dbModels import User, dbSession
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from src.dbModels import shardRouter
+from src.dbModels.HotQueries import complete_user_by_id
 
 app_fetch = Blueprint("fetch", __name__, url_prefix="/fetch/user")
 
 
-def get_complete_user(user_id: int) -> dict:
+def get_complete_user(user_id: int, college_id: str = None) -> dict:
     """
     Fetch complete user details including related entities (details, medications, preferences).
+    The user is read from the shard of `college_id`, or looked up on every shard if it is not known.
     """
-    with dbSession() as dbsession:
-        user = dbsession.query(User).options(
-            joinedload(User.preferences)
-        ).filter(User.id == user_id).one_or_none()
-    return user.as_dict() if user else {}
+    def load(dbsession):
+        user = complete_user_by_id(dbsession, user_id)
+        return user.as_dict() if user else None
+
+    return shardRouter.for_user(load, college_id) or {}
 
 
 @app_fetch.route("/")
@@ -24,4 +25,4 @@ def fetch_user():
     Fetch and return the complete details of the currently authenticated user.
     """
     user_id = get_jwt_identity()  # Get the user ID from the JWT token
-    return jsonify(get_complete_user(user_id)), 200
+    return jsonify(get_complete_user(user_id, get_jwt().get("college_id"))), 200
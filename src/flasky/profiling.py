@@ -0,0 +1,194 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from os import environ
+from os.path import basename
+
+from flask import Blueprint, current_app, g, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .utils import limiter, require_metrics_token
+
+# Create the Blueprint
+app_profiling = Blueprint("profiling", __name__, url_prefix="/admin")
+
+MAX_PROFILE_SECONDS = 60
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread at a fixed interval and counts them in
+    collapsed form ("thread;outer;...;inner"), as used by flamegraph tools.
+    Only one profile runs at a time.
+    """
+
+    def __init__(self):
+        self._running = threading.Lock()
+
+    def run(self, seconds: float, interval: float) -> Counter:
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            stacks = Counter()
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_thread:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        frames.append(f"{code.co_name} ({basename(code.co_filename)})")
+                        frame = frame.f_back
+                    frames.append(names.get(ident, str(ident)))
+                    stacks[";".join(reversed(frames))] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self._running.release()
+
+
+profiler = SamplingProfiler()
+
+
+@app_profiling.route("/profile")
+@limiter.exempt
+def profile():
+    """
+    Sample all worker threads for `seconds` (default 10) and return the
+    collapsed stacks as text, or as JSON with `format=json`.
+    """
+    require_metrics_token()
+    seconds = min(request.args.get("seconds", 10, type=float), MAX_PROFILE_SECONDS)
+    interval = max(request.args.get("interval", 0.005, type=float), 0.001)
+
+    try:
+        stacks = profiler.run(seconds, interval)
+    except RuntimeError as e:
+        return jsonify({"msg": str(e)}), 409
+
+    if request.args.get("format") == "json":
+        return jsonify(samples=sum(stacks.values()), stacks=dict(stacks.most_common())), 200
+    body = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return body, 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+
+# Per-request tracing
+# A request sent with "X-Trace: <PROMETHEUS_TOKEN>" records span timings for
+# JWT decoding and verification, DB calls (including the JWT user lookup),
+# JSON serialisation and template rendering, and returns them in a
+# Server-Timing header.
+
+
+def _trace_spans():
+    if has_request_context():
+        return g.get("trace_spans")
+    return None
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as `name` when the current request is traced."""
+    spans = _trace_spans()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - start))
+
+
+class TracingJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with span("serialization"):
+            return super().dumps(obj, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace_spans() is not None:
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = _trace_spans()
+    if spans is not None and conn.info.get("trace_started"):
+        spans.append(("db", time.perf_counter() - conn.info["trace_started"].pop()))
+
+
+def _before_render_template(app, template, context, **extra):
+    if _trace_spans() is not None:
+        g.trace_render_started = time.perf_counter()
+
+
+def _template_rendered(app, template, context, **extra):
+    spans = _trace_spans()
+    if spans is not None and "trace_render_started" in g:
+        spans.append(("template", time.perf_counter() - g.pop("trace_render_started")))
+
+
+def _trace_jwt_decoding(jwt_manager):
+    # Both verify_jwt_in_request and decode_token end up here, after the
+    # token is read from the request and before the user lookup runs
+    decode = jwt_manager._decode_jwt_from_config
+    if getattr(decode, "traced", False):
+        return
+
+    def traced_decode(*args, **kwargs):
+        with span("jwt"):
+            return decode(*args, **kwargs)
+
+    traced_decode.traced = True
+    jwt_manager._decode_jwt_from_config = traced_decode
+
+
+def init_tracing(app, jwt_manager=None):
+    """Install the tracing hooks on `app`, on every SQLAlchemy engine and on `jwt_manager`."""
+    app.json_provider_class = TracingJSONProvider
+    app.json = TracingJSONProvider(app)
+    if jwt_manager is not None:
+        _trace_jwt_decoding(jwt_manager)
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_trace():
+        token = environ.get("PROMETHEUS_TOKEN")
+        if token and request.headers.get("X-Trace") == token:
+            g.trace_spans = []
+            g.trace_started = time.perf_counter()
+
+    @app.after_request
+    def finish_trace(response):
+        spans = _trace_spans()
+        if spans is None:
+            return response
+
+        totals = defaultdict(float)
+        counts = Counter()
+        for name, duration in spans:
+            totals[name] += duration
+            counts[name] += 1
+        total = time.perf_counter() - g.trace_started
+        timings = [
+            f'{name};dur={totals[name] * 1000:.2f};desc="{counts[name]} calls"'
+            for name in totals
+        ]
+        timings.append(f"total;dur={total * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        current_app.logger.info(
+            f"Trace {request.method} {request.path}: " + ", ".join(timings), exc_info=False
+        )
+        return response
@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+
+from authlib.integrations.flask_client import FlaskOAuth2App, OAuth
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils.pre_loader import config
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = config.getint("oauth", "cache_ttl", fallback=3600)
+REFRESH_INTERVAL = config.getint("oauth", "refresh_interval", fallback=900)
+POOL_MAXSIZE = config.getint("oauth", "pool_maxsize", fallback=10)
+
+# Discovery issuer -> other "iss" values its ID tokens may carry
+ISSUER_ALIASES = {"https://accounts.google.com": ["accounts.google.com"]}
+
+
+class SharedHTTPAdapter(HTTPAdapter):
+    """
+    Connection pool shared by every request session of one provider.
+    Authlib closes its sessions after each call, so `close` is a no-op here.
+    """
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class PooledOAuth2App(FlaskOAuth2App):
+    """
+    OAuth2 client that keeps a persistent connection pool per provider and
+    caches the discovery document and JWKS for `CACHE_TTL` seconds, serving
+    the stale copy if a refresh fails. ID tokens validated locally must carry
+    the discovery document's issuer or one of its `ISSUER_ALIASES`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.adapter = SharedHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=POOL_MAXSIZE,
+            max_retries=Retry(total=2, backoff_factor=0.2),  # Idempotent requests only
+        )
+        self._jwks_loaded_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def _mount(self, session):
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    def _get_session(self):
+        return self._mount(super()._get_session())
+
+    def _get_oauth_client(self, **metadata):
+        return self._mount(super()._get_oauth_client(**metadata))
+
+    def load_server_metadata(self):
+        loaded_at = self.server_metadata.get("_loaded_at")
+        if self._server_metadata_url and loaded_at and time.time() - loaded_at > CACHE_TTL:
+            self._reload_server_metadata()
+        return super().load_server_metadata()
+
+    def fetch_jwk_set(self, force=False):
+        jwk_set = self.server_metadata.get("jwks")
+        if jwk_set and not force and time.time() - self._jwks_loaded_at <= CACHE_TTL:
+            return jwk_set
+        try:
+            jwk_set = super().fetch_jwk_set(force=True)
+        except Exception as e:
+            if not jwk_set:
+                raise
+            logger.warning(f"JWKS refresh for {self.name} failed, using cached keys: {str(e)}")
+            return jwk_set
+        self._jwks_loaded_at = time.time()
+        return jwk_set
+
+    def parse_id_token(self, token, nonce, claims_options=None, **kwargs):
+        issuer = self.load_server_metadata().get("issuer")
+        if claims_options is None and issuer in ISSUER_ALIASES:
+            claims_options = {"iss": {"values": [issuer, *ISSUER_ALIASES[issuer]]}}
+        return super().parse_id_token(token, nonce, claims_options=claims_options, **kwargs)
+
+    def refresh(self):
+        """Reload the discovery document and JWKS ahead of expiry."""
+        with self._refresh_lock:
+            if self._server_metadata_url:
+                self._reload_server_metadata()
+            if self.server_metadata.get("jwks_uri"):
+                self.fetch_jwk_set(force=True)
+
+    def _reload_server_metadata(self):
+        # Drop the load marker so Authlib fetches again; restore it on failure
+        loaded_at = self.server_metadata.pop("_loaded_at", None)
+        try:
+            super().load_server_metadata()
+        except Exception as e:
+            if loaded_at is None:
+                raise
+            logger.warning(f"Metadata refresh for {self.name} failed, using cached copy: {str(e)}")
+            self.server_metadata["_loaded_at"] = loaded_at
+
+
+class PooledOAuth(OAuth):
+    """OAuth registry whose clients are `PooledOAuth2App`s, with background cache refresh."""
+
+    oauth2_client_cls = PooledOAuth2App
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refresher = None
+
+    def start_refresh(self, interval: int = REFRESH_INTERVAL):
+        """Refresh every provider's discovery document and JWKS every `interval` seconds."""
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._refresher = threading.Thread(
+            target=self._refresh_forever, args=(interval,), name="oauth-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def _refresh_forever(self, interval: int):
+        while True:
+            for client in list(self._clients.values()):
+                if isinstance(client, PooledOAuth2App):
+                    try:
+                        client.refresh()
+                    except Exception as e:
+                        logger.warning(f"OAuth refresh for {client.name} failed: {str(e)}")
+            time.sleep(interval)
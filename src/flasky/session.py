@@ -9,10 +9,12 @@ from flask import (
     url_for,
 )
 from sqlalchemy.exc import IntegrityError
-from src.dbModels import User, dbSession
+from src.dbModels import User, shardRouter
+from src.dbModels.HotQueries import complete_user_by_credentials
 from src.security.oneway import generate_secure_hash
 from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
 from .fetch.user import get_complete_user
+from .profiling import span
 from .utils import oauth
 
 
@@ -37,19 +39,24 @@ def login():
     password_hash = generate_secure_hash(password)
 
     try:
-        with dbSession() as dbsession:
-            user = (
-                dbsession.query(User)
-                .filter(User.email == email, User.password == password_hash)
-                .first()
-            )
-
-        if user:
-            user_details = get_complete_user(user.id)  # Fetch complete user details
-            access_token = create_access_token(
-                identity=user_details.get("id"), fresh=True
-            )
-            refresh_token = create_refresh_token(identity=user_details.get("id"))
+        # Check credentials and fetch complete user details in one query per
+        # shard; the college is not known until the user is found
+        def load(dbsession):
+            user = complete_user_by_credentials(dbsession, email, password_hash)
+            return user.as_dict() if user else None
+
+        user_details = shardRouter.for_user(load)
+
+        if user_details:
+            # The college_id claim routes later requests straight to the user's shard
+            claims = {"college_id": user_details.get("college_id")}
+            with span("jwt"):
+                access_token = create_access_token(
+                    identity=user_details.get("id"), fresh=True, additional_claims=claims
+                )
+                refresh_token = create_refresh_token(
+                    identity=user_details.get("id"), additional_claims=claims
+                )
             return (
                 jsonify(
                     user=user_details,
@@ -83,13 +90,14 @@ def register():
 
     try:
         user = User(first_name, last_name, "patient", email, phone, password)
-        with dbSession() as dbsession:
+        with shardRouter.session(user.college_id) as dbsession:
             dbsession.add(user)
             dbsession.commit()
             dbsession.refresh(user)
 
-        access_token = create_access_token(identity=user.id, fresh=True)
-        refresh_token = create_refresh_token(identity=user.id)
+        claims = {"college_id": user.college_id}
+        access_token = create_access_token(identity=user.id, fresh=True, additional_claims=claims)
+        refresh_token = create_refresh_token(identity=user.id, additional_claims=claims)
         return (
             jsonify(
                 user=user.as_dict(),
@@ -125,12 +133,13 @@ def get_token():
     try:
         decoded_token = decode_token(access_token)
         user_id = decoded_token.get("sub")  # "sub" contains the identity
-        user = get_complete_user(user_id)
+        user = get_complete_user(user_id, decoded_token.get("college_id"))
         if not user:
             return jsonify({"msg": "User not found"}), 404
 
-        access_token = create_access_token(identity=user_id, fresh=True)
-        refresh_token = create_refresh_token(identity=user_id)
+        claims = {"college_id": user.get("college_id")}
+        access_token = create_access_token(identity=user_id, fresh=True, additional_claims=claims)
+        refresh_token = create_refresh_token(identity=user_id, additional_claims=claims)
         response = make_response(
             jsonify(
                 {
@@ -189,8 +198,8 @@ def callback_register(platform: str):
         return jsonify({"msg": "Missing session data"}), 400
 
     try:
-        oauth_client.authorize_access_token()
-        user_info = fetch_user_info(oauth_client, platform)
+        token = oauth_client.authorize_access_token()
+        user_info = fetch_user_info(oauth_client, platform, token)
 
         if not user_info.get("email") or not user_info.get("first_name"):
             return jsonify({"msg": "Incomplete user info from OAuth provider"}), 400
@@ -202,7 +211,7 @@ def callback_register(platform: str):
         user = User(
             first_name, last_name, "patient", email, "", ""
         )  # Create a new user
-        with dbSession() as dbsession:
+        with shardRouter.session(user.college_id) as dbsession:
             dbsession.add(user)
             dbsession.commit()
             dbsession.refresh(user)
@@ -210,7 +219,7 @@ def callback_register(platform: str):
         response = make_response(redirect(next_page))
         response.set_cookie(
             "access_token",
-            create_access_token(identity=str(user.id)),
+            create_access_token(identity=str(user.id), additional_claims={"college_id": user.college_id}),
             httponly=False,
             secure=True,
             samesite="None",
@@ -265,19 +274,20 @@ def callback_login(platform: str):
         return jsonify({"msg": "Missing session data"}), 400
 
     try:
-        oauth_client.authorize_access_token()
-        user_info = fetch_user_info(oauth_client, platform)
+        token = oauth_client.authorize_access_token()
+        user_info = fetch_user_info(oauth_client, platform, token)
         email = user_info["email"]
 
-        with dbSession() as dbsession:
-            user = dbsession.query(User).filter(User.email == email).first()
-            if not user:
-                return redirect(error_page), 404
+        user = shardRouter.for_user(
+            lambda dbsession: dbsession.query(User).filter(User.email == email).first()
+        )
+        if not user:
+            return redirect(error_page), 404
 
         response = make_response(redirect(next_page))
         response.set_cookie(
             "access_token",
-            create_access_token(identity=str(user.id)),
+            create_access_token(identity=str(user.id), additional_claims={"college_id": user.college_id}),
             httponly=False,
             secure=True,
             samesite="None",
@@ -288,13 +298,15 @@ def callback_login(platform: str):
         return redirect(error_page), 500
 
 
-def fetch_user_info(oauth_client, platform):
+def fetch_user_info(oauth_client, platform, token):
     """
     Helper function to fetch user information based on the platform.
+    Uses the claims from the locally validated ID token when there is one,
+    and only calls the provider's userinfo endpoint otherwise.
     Currently supports Google OAuth.
     """
     if platform == "google":
-        user_info = oauth_client.get("userinfo").json()
+        user_info = token.get("userinfo") or oauth_client.userinfo()
         return {
             "email": user_info["email"],
             "first_name": user_info.get("given_name", ""),
@@ -0,0 +1,6 @@
+from uuid import uuid4
+
+
+def generate_id() -> str:
+    # Random string primary key for the String `id` columns in SchemaModels
+    return uuid4().hex